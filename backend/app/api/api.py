@@ -1,21 +1,30 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
 
+from app.services.export import ENDPOINT_FIELDS, EVENT_FIELDS, csv_chunks, gzip_chunks, ndjson_chunks
+
 # This is creating a simple router for the API endpoints
 
 router = APIRouter(prefix="/api")
 
-# GET /api/endpoints?org_id=xxx
-# Returns: { "orgName": "...", "endpoints": [...], "totalEndpoints": 2 }
-# Lists all storage endpoints for an organization
+# GET /api/endpoints?org_id=xxx&sort=name&provider=AWS&region=us-east-1&security_status=insecure&cursor=...&limit=100
+# Returns: { "orgName": "...", "endpoints": [...], "totalEndpoints": 2, "nextCursor": "..." }
+# Lists a page of storage endpoints for an organization - pass nextCursor back as cursor to get the next page
+# totalEndpoints is how many endpoints match the filters across all pages
+# sort can be name, size or last_scanned
 @router.get("/endpoints")
-async def list_endpoints(request: Request, org_id: str) -> Dict[str, Any]:
+async def list_endpoints(request: Request, org_id: str, sort: str = "name", provider: str = None, region: str = None,
+                         security_status: str = None, cursor: str = None, limit: int = 100) -> Dict[str, Any]:
     """
     GET /api/endpoints?org_id=...
-    Returns list of endpoints for the org.
+    Returns a page of endpoints for the org.
     """
     service = request.app.state.service  
-    return await service.get_endpoints_for_org(org_id)
+    try:
+        return await service.get_endpoints_for_org(org_id, sort, provider, region, security_status, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # POST /api/endpoints?org_id=xxx&provider=AWS&name=my-bucket&region=us-east-1
 # Returns: { "orgName": "...", "endpointId": "...", "provider": "AWS", "name": "...", "region": "..." }
@@ -44,17 +53,21 @@ async def delete_endpoint(request: Request, endpoint_id: str, org_id: str) -> Di
         raise HTTPException(status_code=404, detail="Endpoint not found")
     return {"message": "Endpoint deleted", "endpoint_id": endpoint_id}
 
-# GET /api/security/policies?org_id=xxx
-# Returns: { "orgName": "...", "endpoints": [{ "endpointId": "...", "securityStatus": "secure", "issueCount": 0 }] }
-# Shows security status (secure/insecure) for all endpoints
+# GET /api/security/policies?org_id=xxx&sort=name&provider=AWS&region=us-east-1&security_status=insecure&cursor=...&limit=100
+# Returns: { "orgName": "...", "endpoints": [{ "endpointId": "...", "securityStatus": "secure", "issueCount": 0 }], "nextCursor": "..." }
+# Shows security status (secure/insecure) for a page of endpoints
 @router.get("/security/policies")
-async def get_policies_summary(request: Request, org_id: str) -> Dict[str, Any]:
+async def get_policies_summary(request: Request, org_id: str, sort: str = "name", provider: str = None, region: str = None,
+                               security_status: str = None, cursor: str = None, limit: int = 100) -> Dict[str, Any]:
     """
     GET /api/security/policies?org_id=...
-    Returns policy summary for all endpoints in org.
+    Returns policy summary for a page of endpoints in org.
     """
     service = request.app.state.service  
-    return await service.get_policies_summary(org_id)
+    try:
+        return await service.get_policies_summary(org_id, sort, provider, region, security_status, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # GET /api/security/policies/{endpoint_id}?org_id=xxx
 # Returns: { "orgName": "...", "endpointId": "...", "securityStatus": "insecure", "issueCount": 3 }
@@ -107,17 +120,37 @@ async def get_events_summary(request: Request, org_id: str) -> Dict[str, Any]:
     service = request.app.state.service  
     return await service.get_events_count(org_id)
 
-# GET /api/storage/size?org_id=xxx
-# Returns: { "orgName": "...", "endpoints": [{ "endpointId": "...", "name": "...", "sizeGB": 505.5 }], "totalSizeGB": 505.5 }
-# Shows storage size in GB for each endpoint and total
+# GET /api/storage/size?org_id=xxx&sort=size&provider=AWS&region=us-east-1&security_status=insecure&cursor=...&limit=100
+# Returns: { "orgName": "...", "endpoints": [{ "endpointId": "...", "name": "...", "sizeGB": 505.5 }], "totalSizeGB": 505.5, "nextCursor": "..." }
+# Shows storage size in GB for a page of endpoints and the total for the whole org
 @router.get("/storage/size")
-async def get_storage_sizes(request: Request, org_id: str) -> Dict[str, Any]:
+async def get_storage_sizes(request: Request, org_id: str, sort: str = "size", provider: str = None, region: str = None,
+                            security_status: str = None, cursor: str = None, limit: int = 100) -> Dict[str, Any]:
     """
     GET /api/storage/size?org_id=...
     Returns storage size per endpoint.
     """
     service = request.app.state.service  
-    return await service.get_storage_sizes(org_id)
+    try:
+        return await service.get_storage_sizes(org_id, sort, provider, region, security_status, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# GET /api/storage/history?org_id=xxx&endpoint_id=xxx&days=30&resolution=day
+# Returns: { "orgName": "...", "endpointId": null, "resolution": "day", "from": "...", "to": "...", "points": [{ "bucket": "...", "sizeGB": 505.5, "issueCount": 3, "dataTypes": ["SSN"] }] }
+# Shows storage growth and findings over time for the whole org or one endpoint
+# resolution can be hour, day or month - if it is left out the finest one that fits the range is used
+@router.get("/storage/history")
+async def get_storage_history(request: Request, org_id: str, endpoint_id: str = None, days: int = 30, resolution: str = None) -> Dict[str, Any]:
+    """
+    GET /api/storage/history?org_id=...&days=30
+    Returns storage and findings history from the rollups.
+    """
+    service = request.app.state.service  
+    try:
+        return await service.get_storage_history(org_id, endpoint_id, days, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # GET /api/providers?org_id=xxx
 # Returns: { "orgName": "...", "providers": [{ "name": "AWS", "endpointCount": 15, "totalStorageGB": 2500.5 }] }
@@ -129,4 +162,55 @@ async def get_providers_summary(request: Request, org_id: str) -> Dict[str, Any]
     Returns provider summary (count and storage per provider).
     """
     service = request.app.state.service  
-    return await service.get_providers_summary(org_id)
\ No newline at end of file
+    return await service.get_providers_summary(org_id)
+
+# GET /api/metrics/coalescing
+# Returns: { "calls": 120, "executions": 14, "coalesced": 100, "cacheHits": 6, "errors": 0, "inFlight": 0, "ttlSeconds": 0.0 }
+# Shows how many read calls were shared with an identical call that was already running
+@router.get("/metrics/coalescing")
+async def get_coalescing_metrics(request: Request) -> Dict[str, Any]:
+    """
+    GET /api/metrics/coalescing
+    Returns request coalescing metrics for the service read methods.
+    """
+    service = request.app.state.service  
+    return service.flights.stats()
+
+# Builds the streaming response for an export
+# rows is the async iterator from the service, it is only read as the client reads the response so memory stays flat
+def export_response(rows, fields: List[str], filename: str, format: str, gzip: bool) -> StreamingResponse:
+    if format == "ndjson":
+        chunks, media_type = ndjson_chunks(rows), "application/x-ndjson"
+    elif format == "csv":
+        chunks, media_type = csv_chunks(rows, fields), "text/csv"
+    else:
+        raise HTTPException(status_code=400, detail="Invalid format, must be ndjson or csv")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+# GET /api/export/events?org_id=xxx&format=ndjson&gzip=false
+# Returns: every event for the org as ndjson or csv, one event per line/row
+# Full event history export for compliance - streamed so it works no matter how many events there are
+@router.get("/export/events")
+async def export_events(request: Request, org_id: str, format: str = "ndjson", gzip: bool = False) -> StreamingResponse:
+    """
+    GET /api/export/events?org_id=...&format=ndjson|csv&gzip=true|false
+    Streams all events for the org.
+    """
+    service = request.app.state.service  
+    return export_response(service.export_events(org_id), EVENT_FIELDS, "events", format, gzip)
+
+# GET /api/export/endpoints?org_id=xxx&format=csv&gzip=true
+# Returns: every endpoint for the org with security status and private data findings as ndjson or csv
+# Full endpoint inventory export for compliance
+@router.get("/export/endpoints")
+async def export_endpoints(request: Request, org_id: str, format: str = "ndjson", gzip: bool = False) -> StreamingResponse:
+    """
+    GET /api/export/endpoints?org_id=...&format=ndjson|csv&gzip=true|false
+    Streams the endpoint inventory for the org.
+    """
+    service = request.app.state.service  
+    return export_response(service.export_endpoint_inventory(org_id), ENDPOINT_FIELDS, "endpoints", format, gzip)
\ No newline at end of file
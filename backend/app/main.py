@@ -35,7 +35,8 @@ app = FastAPI(lifespan=lifespan)
 
 # Create service instance and attach to app state
 app.state.dac = dac
-app.state.service = Services(dac)
+# COALESCE_TTL_SECONDS is how long identical read results are reused after the call finishes, 0 only shares calls that are running at the same time
+app.state.service = Services(dac, coalesce_ttl=float(os.getenv("COALESCE_TTL_SECONDS", "0")))
 # This is probably what we should have at some point - came from this doc I used to help create the dac https://python-dependency-injector.ets-labs.org/examples/fastapi-sqlalchemy.html
 
 app.include_router(api.router)
@@ -0,0 +1,177 @@
+# This is the incremental scanning logic that sits between listing a bucket and scanning the objects in it
+
+# Every endpoint gets a manifest of the objects that were scanned last time (key, size, etag/mtime and a hash of the result)
+# On the next scan we list the bucket, diff it against the manifest and only scan the objects that are new or changed
+# Results for unchanged objects are carried forward from the manifest so that the daily rescans of buckets that barely change
+# only cost as much as the changes instead of the whole bucket
+# storage_bytes is worked out from the manifest delta as well so we dont have to add up every object again
+
+# A listing is just a dictionary of object key -> {"size": int, "etag": str}
+# The manifest rows are dictionaries of object key -> {"size": int, "etag": str, "data_types": [...], "result_hash": str}
+# A local directory can be used in place of a bucket for testing - see list_local_objects and LocalManifestStore
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import hashlib
+import json
+import os
+
+from app.database.sqlalc_dac import Sql_Alc_DAC
+
+
+# Lists every file under a local directory as if it were a bucket
+# The key is the path relative to the root with forward slashes so it looks like an object key
+# There is no etag for a local file so the mtime and size are used instead
+def list_local_objects(root: str) -> Dict[str, Dict[str, Any]]:
+    """Returns a listing of the files under root keyed by relative path."""
+    objects: Dict[str, Dict[str, Any]] = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            full_path = os.path.join(dir_path, file_name)
+            stat = os.stat(full_path)
+            key = os.path.relpath(full_path, root).replace(os.sep, "/")
+            objects[key] = {"size": stat.st_size, "etag": f"{stat.st_mtime_ns}-{stat.st_size}"}
+    return objects
+
+
+# Lists every object in an S3 bucket using the paginator so large buckets do not have to fit in one response
+# boto3 is imported here so the rest of this module can be used without it (local directory testing)
+def list_s3_objects(bucket: str, region: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Returns a listing of the objects in an S3 bucket keyed by object key."""
+    from boto3 import client as boto3_client
+
+    s3_client = boto3_client("s3", region_name=region)
+    objects: Dict[str, Dict[str, Any]] = {}
+    for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            objects[obj["Key"]] = {"size": obj["Size"], "etag": obj["ETag"].strip('"')}
+    return objects
+
+
+# Hash of a scan result so that we can tell if the findings for an object changed without comparing the whole thing
+def result_hash(data_types: Iterable[str]) -> str:
+    """Returns a stable hash of the data types found in an object."""
+    return hashlib.sha256(json.dumps(sorted(data_types)).encode("utf-8")).hexdigest()
+
+
+# Compares the current listing against the previous manifest
+# An object is changed if either the size or the etag is different from what we saw last time
+# Returns: the keys split into new, changed, unchanged and deleted
+def diff_manifest(previous: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Returns the keys of current that are new, changed or unchanged and the keys of previous that were deleted."""
+    diff: Dict[str, List[str]] = {"new": [], "changed": [], "unchanged": [], "deleted": []}
+    for key, obj in current.items():
+        old = previous.get(key)
+        if old is None:
+            diff["new"].append(key)
+        elif old.get("size") != obj.get("size") or old.get("etag") != obj.get("etag"):
+            diff["changed"].append(key)
+        else:
+            diff["unchanged"].append(key)
+    diff["deleted"] = [key for key in previous if key not in current]
+    return diff
+
+
+# Runs an incremental scan for an endpoint
+# store is anything that has get_object_manifest, upsert_manifest_entries and delete_manifest_entries - the dac or a LocalManifestStore
+# objects is the current listing of the bucket (see list_local_objects and list_s3_objects)
+# scan_object is the function that does the actual scanning of one object and returns the data types found in it
+# Returns: summary of the scan with the new storage_bytes and the data types found across the whole endpoint
+async def incremental_scan(
+    store: Any,
+    endpoint_id: str,
+    objects: Dict[str, Dict[str, Any]],
+    scan_object: Callable[[str], Awaitable[List[str]]],
+) -> Dict[str, Any]:
+    """Scans only the new and changed objects and carries results forward for the rest."""
+    previous = await store.get_object_manifest(endpoint_id)
+    diff = diff_manifest(previous, objects)
+
+    # Only the new and changed objects get scanned - this is where the time is saved
+    entries: List[Dict[str, Any]] = []
+    for key in diff["new"] + diff["changed"]:
+        data_types = sorted(set(await scan_object(key)))
+        entries.append({
+            "object_key": key,
+            "size": objects[key]["size"],
+            "etag": objects[key]["etag"],
+            "data_types": data_types,
+            "result_hash": result_hash(data_types),
+        })
+
+    # storage_bytes is the previous total plus the delta of the objects that were added, changed or removed
+    previous_bytes = sum(int(old.get("size", 0)) for old in previous.values())
+    delta_bytes = sum(e["size"] for e in entries)
+    delta_bytes -= sum(int(previous[key].get("size", 0)) for key in diff["changed"] + diff["deleted"])
+
+    if entries:
+        await store.upsert_manifest_entries(endpoint_id, entries)
+    if diff["deleted"]:
+        await store.delete_manifest_entries(endpoint_id, diff["deleted"])
+
+    # Results for unchanged objects come straight from the manifest
+    data_types = set()
+    for key in diff["unchanged"]:
+        data_types.update(previous[key].get("data_types") or [])
+    for e in entries:
+        data_types.update(e["data_types"])
+
+    return {
+        "endpoint_id": endpoint_id,
+        "scanned": len(entries),
+        "new": len(diff["new"]),
+        "changed": len(diff["changed"]),
+        "unchanged": len(diff["unchanged"]),
+        "deleted": len(diff["deleted"]),
+        "storage_bytes": previous_bytes + delta_bytes,
+        "delta_bytes": delta_bytes,
+        "data_types": sorted(data_types),
+    }
+
+
+# Writes the results of an incremental scan back to the endpoint
+# This updates storage_bytes (which also marks the endpoint as scanned) and the private data findings
+async def record_scan_results(dac: Sql_Alc_DAC, summary: Dict[str, Any]) -> None:
+    """Saves the storage size and private data found by incremental_scan."""
+    endpoint_id = summary["endpoint_id"]
+    await dac.update_endpoint_storage(endpoint_id, summary["storage_bytes"])
+    await dac.insert_private_data(endpoint_id, bool(summary["data_types"]), summary["data_types"])
+
+
+# Manifest store that keeps the manifests in a json file instead of postgres
+# This has the same methods as the dac so it can be passed to incremental_scan for testing against a local directory
+class LocalManifestStore:
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, manifests: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(manifests, f, separators=(",", ":"))
+
+    async def get_object_manifest(self, endpoint_id: str) -> Dict[str, Dict[str, Any]]:
+        return self._load().get(str(endpoint_id), {})
+
+    async def upsert_manifest_entries(self, endpoint_id: str, entries: List[Dict[str, Any]]) -> None:
+        manifests = self._load()
+        manifest = manifests.setdefault(str(endpoint_id), {})
+        for e in entries:
+            manifest[e["object_key"]] = {
+                "size": e["size"],
+                "etag": e["etag"],
+                "data_types": e["data_types"],
+                "result_hash": e["result_hash"],
+            }
+        self._save(manifests)
+
+    async def delete_manifest_entries(self, endpoint_id: str, object_keys: List[str]) -> None:
+        manifests = self._load()
+        manifest = manifests.get(str(endpoint_id), {})
+        for key in object_keys:
+            manifest.pop(key, None)
+        self._save(manifests)
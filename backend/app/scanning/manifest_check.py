@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+
+from app.database.sqlalc_dac import Sql_Alc_DAC
+from app.scanning.manifest import LocalManifestStore, incremental_scan, list_local_objects, record_scan_results
+
+# This is a check for the incremental scan that runs against a temp directory standing in for a bucket
+# It does a first scan, a rescan with nothing changed, and a rescan after adding, changing and deleting files
+# and makes sure only the new and changed files are scanned and storage_bytes comes out right from the manifest delta
+# It also runs record_scan_results against a dac that checks every query binds the params it is given
+# so a bad bind (like :data_types::jsonb) is caught without needing a database
+
+# Run it from the backend directory:
+# python -m app.scanning.manifest_check
+
+
+# A dac that checks the sql binds every param and records the calls instead of running them
+class BindCheckingDAC(Sql_Alc_DAC):
+
+    def __init__(self):
+        super().__init__("postgresql+asyncpg://localhost/unused")
+        self.calls: List[Dict[str, Any]] = []
+
+    async def query(self, sql_query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        params = params or {}
+        bound = set(text(sql_query).compile().params)
+        if bound != set(params):
+            raise AssertionError(f"query binds {sorted(bound)} but was given {sorted(params)}")
+        self.calls.append(params)
+        return [dict(params)]
+
+
+# Fake scanner - a file has an SSN in it if the text says so
+def make_scanner(root: str, scanned: List[str]):
+    async def scan_object(key: str) -> List[str]:
+        scanned.append(key)
+        with open(os.path.join(root, key), "r", encoding="utf-8") as f:
+            return ["SSN"] if "ssn" in f.read() else []
+    return scan_object
+
+
+def write(root: str, key: str, content: str) -> None:
+    path = os.path.join(root, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def expect(label: str, actual: Any, expected: Any) -> None:
+    if actual != expected:
+        raise AssertionError(f"{label}: expected {expected!r} but got {actual!r}")
+    print(f"ok   {label}")
+
+
+async def check_incremental_scan() -> None:
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as state:
+        store = LocalManifestStore(os.path.join(state, "manifest.json"))
+        write(root, "a.txt", "ssn 123-45-6789")
+        write(root, "b.txt", "hello")
+        write(root, "sub/c.txt", "0123456789")
+
+        # First scan - everything is new
+        scanned: List[str] = []
+        summary = await incremental_scan(store, "endpoint-1", list_local_objects(root), make_scanner(root, scanned))
+        expect("first scan scans every object", sorted(scanned), ["a.txt", "b.txt", "sub/c.txt"])
+        expect("first scan new count", summary["new"], 3)
+        expect("first scan storage_bytes", summary["storage_bytes"], 15 + 5 + 10)
+        expect("first scan data types", summary["data_types"], ["SSN"])
+
+        # Nothing changed - nothing is scanned and the results are carried forward
+        scanned.clear()
+        summary = await incremental_scan(store, "endpoint-1", list_local_objects(root), make_scanner(root, scanned))
+        expect("unchanged rescan scans nothing", scanned, [])
+        expect("unchanged rescan unchanged count", summary["unchanged"], 3)
+        expect("unchanged rescan delta", summary["delta_bytes"], 0)
+        expect("unchanged rescan carries data types forward", summary["data_types"], ["SSN"])
+
+        # Add one, change one, delete one
+        write(root, "d.txt", "new file")
+        write(root, "b.txt", "hello world")
+        os.remove(os.path.join(root, "a.txt"))
+        scanned.clear()
+        summary = await incremental_scan(store, "endpoint-1", list_local_objects(root), make_scanner(root, scanned))
+        expect("rescan only scans new and changed", sorted(scanned), ["b.txt", "d.txt"])
+        expect("rescan counts", (summary["new"], summary["changed"], summary["unchanged"], summary["deleted"]), (1, 1, 1, 1))
+        expect("rescan delta", summary["delta_bytes"], 8 + (11 - 5) - 15)
+        expect("rescan storage_bytes", summary["storage_bytes"], 11 + 10 + 8)
+        expect("rescan drops data types of deleted objects", summary["data_types"], [])
+        expect("manifest matches directory", sorted(await store.get_object_manifest("endpoint-1")), ["b.txt", "d.txt", "sub/c.txt"])
+
+        # Writing the results back binds the right params
+        dac = BindCheckingDAC()
+        await record_scan_results(dac, summary)
+        expect("record_scan_results storage_bytes", dac.calls[0]["storage_bytes"], 29)
+        expect("record_scan_results private data", any(c.get("has_private") is False for c in dac.calls), True)
+
+
+async def main():
+    try:
+        await check_incremental_scan()
+    except AssertionError as e:
+        print(f"FAIL {e}")
+        sys.exit(1)
+    print("Incremental scan check passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
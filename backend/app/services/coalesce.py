@@ -0,0 +1,102 @@
+# This is the request coalescing (single flight) for the service read methods
+
+# When a lot of dashboard tabs for the same org refresh at the same time they all ask for the same thing
+# Instead of each one running its own identical queries, the first call runs and every call with the same method and arguments
+# that comes in while it is still running waits on that same call and gets the same result (or the same error)
+# There is also an optional micro ttl - if it is set the result is reused for that many seconds after the call finishes
+# This is off by default (ttl of 0) since even a couple of seconds means the data can be slightly stale
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import functools
+import inspect
+import time
+
+# Once there are this many cached results the expired ones get cleared out
+MAX_RECENT = 1024
+
+
+class SingleFlight:
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}
+        # These are the metrics - calls is everything, executions is how many actually ran
+        # coalesced is how many joined a call that was already running and cache_hits is how many used the ttl cache
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+    # Runs fn for the key unless a call for the same key is already running, in that case waits for that one instead
+    # The call runs as its own task and is shielded so if the caller that started it goes away (like a client disconnect)
+    # the call keeps going for everyone else that is waiting on it
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        if self.ttl > 0:
+            recent = self._recent.get(key)
+            if recent is not None and time.monotonic() - recent[0] < self.ttl:
+                self.cache_hits += 1
+                return recent[1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._finish, key))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    # Called when the shared call is done - removes it from in flight and caches the result if there is a ttl
+    # Errors are never cached so the next call after a failure tries again
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.errors += 1
+            return
+        if self.ttl > 0:
+            now = time.monotonic()
+            if len(self._recent) >= MAX_RECENT:
+                self._recent = {k: v for k, v in self._recent.items() if now - v[0] < self.ttl}
+            self._recent[key] = (now, task.result())
+
+    # Returns: the metrics as a dictionary for the api
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "cacheHits": self.cache_hits,
+            "errors": self.errors,
+            "inFlight": len(self._in_flight),
+            "ttlSeconds": self.ttl,
+        }
+
+
+# Decorator for the read methods on Services - the key is the method name and the arguments
+# The arguments are bound to the method signature with the defaults filled in so get_events_count("x"),
+# get_events_count(org_id="x") and a call that passes a default explicitly all get the same key
+# The object it is used on needs a flights attribute that is a SingleFlight
+# Every waiter gets the same result object back so the result should not be changed by the caller
+def coalesced(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__, tuple(v for k, v in bound.arguments.items() if k != "self"))
+        try:
+            hash(key)
+        except TypeError:
+            # Arguments that can not be hashed (like lists) can not be used as a key so just run it
+            return await method(self, *args, **kwargs)
+        return await self.flights.do(key, lambda: method(self, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,61 @@
+# These are the helpers that turn a stream of formatted rows into the bytes for an export response
+
+# Rows are written into a buffer and only handed to the response once the buffer is big enough
+# That way we are not sending a tiny chunk for every row but we also never hold more than one chunk in memory
+# This is used with the export methods on the service and a StreamingResponse in the api
+
+from typing import Any, AsyncIterator, Dict, List
+import csv
+import io
+import json
+import zlib
+
+# Roughly how many bytes are collected before a chunk is sent
+CHUNK_SIZE = 64 * 1024
+
+# The columns for the csv exports - ndjson just uses whatever keys the rows have
+EVENT_FIELDS = ["eventId", "endpointId", "eventType", "severity", "description", "foundAt"]
+ENDPOINT_FIELDS = [
+    "endpointId", "provider", "name", "region", "storageBytes", "sizeGB", "onboardedAt",
+    "lastScannedAt", "securityStatus", "issueCount", "hasPrivateData", "dataTypes",
+]
+
+
+# One json object per line
+async def ndjson_chunks(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    async for row in rows:
+        buffer.write(json.dumps(row, default=str))
+        buffer.write("\n")
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# Header row then one row per record
+# Lists (like dataTypes) are joined with ; so they fit in one cell
+async def csv_chunks(rows: AsyncIterator[Dict[str, Any]], fields: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow({k: ";".join(map(str, v)) if isinstance(v, list) else v for k, v in row.items()})
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# Gzips the chunks as they go by - wbits=31 makes zlib write the gzip header so this works with Content-Encoding: gzip
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -4,20 +4,198 @@
 
 # This is what will allow it to call the dac - Will need to be tested as I do not know if that is correct
 
-from typing import Any, Dict, List, Optional
-from app.database.sqlalc_dac import Sql_Alc_DAC
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from app.database.sqlalc_dac import ENDPOINT_SORTS, Sql_Alc_DAC, data_types_from_flags
+from app.services.coalesce import SingleFlight, coalesced
+
+# This is the biggest page that the endpoint listings will return no matter what limit is asked for
+MAX_PAGE_SIZE = 500
+
+
+# This is the most points the storage history will return so long range charts stay small
+MAX_HISTORY_POINTS = 400
+
+# How far back each rollup resolution is kept (see prune_endpoint_history in the dac) and how long one bucket is
+HISTORY_RESOLUTIONS = {
+    "hour": (timedelta(days=90), timedelta(hours=1)),
+    "day": (timedelta(days=3 * 365), timedelta(days=1)),
+    "month": (None, timedelta(days=31)),
+}
+
+
+# Picks the rollup to read the history from
+# If no resolution is asked for this uses the finest one that is still kept that far back and fits in MAX_HISTORY_POINTS
+# The org wide history never uses hour since most endpoints are only scanned once a day so the hourly points would mostly be carried forward values
+# The + 1 is for the partial bucket at the start since start gets moved back to the start of its bucket
+# Raises ValueError if the resolution is not supported or would return too many points
+def history_resolution(days: int, resolution: Optional[str], org_wide: bool) -> str:
+    span = timedelta(days=days)
+    if resolution is None:
+        for candidate in ("hour", "day", "month"):
+            kept, bucket = HISTORY_RESOLUTIONS[candidate]
+            if candidate == "hour" and org_wide:
+                continue
+            if (kept is None or span <= kept) and span / bucket + 1 <= MAX_HISTORY_POINTS:
+                return candidate
+        return "month"
+    if resolution not in HISTORY_RESOLUTIONS:
+        raise ValueError(f"Invalid resolution, must be one of: {', '.join(HISTORY_RESOLUTIONS)}")
+    if span / HISTORY_RESOLUTIONS[resolution][1] + 1 > MAX_HISTORY_POINTS:
+        raise ValueError(f"Too many points for resolution {resolution}, use a shorter range or a coarser resolution")
+    return resolution
+
+
+# Moves a UTC time back to the start of the rollup bucket it is in, the same as date_trunc(resolution, ts, 'UTC') in the dac
+# Without this the bucket that start falls in would be left out since its bucket time is before start
+def history_bucket_start(ts: datetime, resolution: str) -> datetime:
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    if resolution in ("day", "month"):
+        ts = ts.replace(hour=0)
+    if resolution == "month":
+        ts = ts.replace(day=1)
+    return ts
+
+
+# Every bucket start from start (already a bucket start) up to end, in utc
+def history_buckets(start: datetime, end: datetime, resolution: str) -> List[datetime]:
+    buckets = []
+    bucket = start
+    while bucket < end:
+        buckets.append(bucket)
+        if resolution == "month":
+            bucket = bucket.replace(year=bucket.year + bucket.month // 12, month=bucket.month % 12 + 1)
+        else:
+            bucket = bucket + HISTORY_RESOLUTIONS[resolution][1]
+    return buckets
+
+
+# Turns the endpoint rollups from get_endpoint_history into a point for every bucket
+# Each value is the last one written at or before the bucket, the first row from the dac (bucket None) has the values from before start
+# No rows means the endpoint is not in the org so there are no points
+def endpoint_history_points(rows: List[Dict[str, Any]], buckets: List[datetime]) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+    columns = ("storage_bytes", "issue_count", "data_type_flags")
+    last: Dict[str, Any] = dict.fromkeys(columns)
+    by_bucket = {}
+    for row in rows:
+        if row.get("bucket") is None:
+            last.update({c: row.get(c) for c in columns})
+        else:
+            by_bucket[row["bucket"]] = row
+
+    points = []
+    for bucket in buckets:
+        row = by_bucket.get(bucket, {})
+        last.update({c: row[c] for c in columns if row.get(c) is not None})
+        points.append({"bucket": bucket, **last})
+    return points
+
+
+# Turns the org rollup changes from get_org_history into the org totals for every bucket
+# The totals at a bucket are all the changes up to and including it, an org has a data type while any endpoint has it
+def org_history_points(rows: List[Dict[str, Any]], buckets: List[datetime]) -> List[Dict[str, Any]]:
+    storage_bytes, issue_count = 0, 0
+    data_type_counts: List[int] = []
+    points = []
+    i = 0
+    for bucket in buckets:
+        while i < len(rows) and rows[i]["bucket"] <= bucket:
+            row = rows[i]
+            storage_bytes += row.get("storage_bytes_delta") or 0
+            issue_count += row.get("issue_count_delta") or 0
+            for bit, delta in enumerate(row.get("data_type_deltas") or []):
+                if bit == len(data_type_counts):
+                    data_type_counts.append(0)
+                data_type_counts[bit] += delta
+            i += 1
+        points.append({
+            "bucket": bucket,
+            "storage_bytes": storage_bytes,
+            "issue_count": issue_count,
+            "data_type_flags": sum(1 << bit for bit, count in enumerate(data_type_counts) if count > 0),
+        })
+    return points
+
+
+# The cursor is the sort, the sort value and endpoint_id of the last row on the page encoded as url safe base64 json
+# This is what gets passed back in as cursor to get the next page
+def encode_cursor(row: Dict[str, Any], sort: str) -> str:
+    value = row.get(ENDPOINT_SORTS[sort][0])
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, str(row.get("endpoint_id"))])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+# Turns a cursor back into the (sort value, endpoint_id) tuple the dac expects
+# The value has to be the right type for the sort column since it is compared to it in the query, otherwise it is a db error
+# Raises ValueError if the cursor was not made by encode_cursor for this sort
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    try:
+        cursor_sort, value, endpoint_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        endpoint_id = str(uuid.UUID(endpoint_id))
+    except (binascii.Error, AttributeError, TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor is for sort={cursor_sort}, not sort={sort}")
+
+    column = ENDPOINT_SORTS[sort][0]
+    if column == "name" and isinstance(value, str):
+        return value, endpoint_id
+    if column == "storage_bytes" and isinstance(value, int) and not isinstance(value, bool):
+        return value, endpoint_id
+    if column == "last_scanned_at" and value is None:
+        return value, endpoint_id
+    if column == "last_scanned_at" and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value), endpoint_id
+        except ValueError as e:
+            raise ValueError("Invalid cursor") from e
+    raise ValueError("Invalid cursor")
+
+
+# Checks the paging options and turns them into what the dac needs
+# Raises ValueError if the sort is not one of the supported ones
+def page_options(sort: str, cursor: Optional[str], limit: int) -> Tuple[Optional[Tuple[Any, str]], int]:
+    if sort not in ENDPOINT_SORTS:
+        raise ValueError(f"Invalid sort, must be one of: {', '.join(ENDPOINT_SORTS)}")
+    return (decode_cursor(cursor, sort) if cursor else None), max(1, min(limit, MAX_PAGE_SIZE))
+
+
+# The dac returns one extra row so we know if there is another page
+# Returns: the rows for this page and the cursor for the next page (None if this is the last page)
+def split_page(rows: List[Dict[str, Any]], limit: int, sort: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], sort)
 
 
 class Services:
 
-    def __init__(self, dac: Sql_Alc_DAC):
+    # coalesce_ttl is the optional micro ttl for the coalesced read methods (see app/services/coalesce.py), 0 means off
+    def __init__(self, dac: Sql_Alc_DAC, coalesce_ttl: float = 0.0):
         self.dac = dac
+        self.flights = SingleFlight(coalesce_ttl)
 
-    # Gets all endpoints for an org and formats as JSON with org name and total count
-    async def get_endpoints_for_org(self, org_id: str) -> Dict[str, Any]:
+    # Gets a page of endpoints for an org and formats as JSON with org name, count (first page only) and the cursor for the next page
+    @coalesced
+    async def get_endpoints_for_org(self, org_id: str, sort: str = "name", provider: Optional[str] = None,
+                                    region: Optional[str] = None, security_status: Optional[str] = None,
+                                    cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
         """Returns formatted endpoint list with org name and total count."""
+        after, limit = page_options(sort, cursor, limit)
         org_name = await self.dac.get_org_name(org_id)
-        endpoints = await self.dac.get_endpoints_for_org(org_id)
+        rows = await self.dac.get_endpoints_for_org(org_id, sort, provider, region, security_status, after, limit)
+        # The count reads every matching endpoint so it is only done for the first page, the later pages return null
+        total = await self.dac.count_endpoints(org_id, provider, region, security_status) if cursor is None else None
+        endpoints, next_cursor = split_page(rows, limit, sort)
         
         # Format endpoints to match expected structure
         formatted_endpoints = [
@@ -33,7 +211,8 @@ class Services:
         return {
             "orgName": org_name,
             "endpoints": formatted_endpoints,
-            "totalEndpoints": len(formatted_endpoints)
+            "totalEndpoints": total,
+            "nextCursor": next_cursor
         }
     
     # Creates a new storage endpoint and returns formatted response with org name
@@ -55,11 +234,16 @@ class Services:
     async def delete_endpoint(self, endpoint_id: str, org_id: str) -> bool:
         return await self.dac.delete_endpoint(endpoint_id, org_id)
 
-    # Gets security status for all endpoints (secure/insecure) and formats as JSON
-    async def get_policies_summary(self, org_id: str) -> Dict[str, Any]:
+    # Gets security status for a page of endpoints (secure/insecure) and formats as JSON
+    @coalesced
+    async def get_policies_summary(self, org_id: str, sort: str = "name", provider: Optional[str] = None,
+                                   region: Optional[str] = None, security_status: Optional[str] = None,
+                                   cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
         """Returns formatted security policies summary."""
+        after, limit = page_options(sort, cursor, limit)
         org_name = await self.dac.get_org_name(org_id)
-        policies = await self.dac.get_policies_summary(org_id)
+        rows = await self.dac.get_policies_summary(org_id, sort, provider, region, security_status, after, limit)
+        policies, next_cursor = split_page(rows, limit, sort)
         
         formatted_endpoints = [
             {
@@ -74,10 +258,12 @@ class Services:
         
         return {
             "orgName": org_name,
-            "endpoints": formatted_endpoints
+            "endpoints": formatted_endpoints,
+            "nextCursor": next_cursor
         }
 
     # Gets detailed security info for a specific endpoint
+    @coalesced
     async def get_policy_detail(self, endpoint_id: str, org_id: str) -> Dict[str, Any]:
         """Returns formatted policy detail for an endpoint."""
         org_name = await self.dac.get_org_name(org_id)
@@ -98,6 +284,7 @@ class Services:
         }
 
     # Shows which endpoints contain sensitive private data (SSN, credit cards, etc.)
+    @coalesced
     async def get_private_data_summary(self, org_id: str) -> Dict[str, Any]:
         """Returns formatted private data summary."""
         org_name = await self.dac.get_org_name(org_id)
@@ -120,6 +307,7 @@ class Services:
         }
 
     # Returns total count of all security/configuration events for the org
+    @coalesced
     async def get_events_count(self, org_id: str) -> Dict[str, Any]:
         """Returns formatted events summary."""
         org_name = await self.dac.get_org_name(org_id)
@@ -131,6 +319,7 @@ class Services:
         }
 
     # Gets recent security and configuration events with full details
+    @coalesced
     async def get_recent_events(self, org_id: str, limit: int = 50) -> Dict[str, Any]:
         """Returns formatted recent events list."""
         org_name = await self.dac.get_org_name(org_id)
@@ -154,11 +343,48 @@ class Services:
             "events": formatted_events
         }
 
-    # Gets storage size in GB for each endpoint plus total storage across all endpoints
-    async def get_storage_sizes(self, org_id: str) -> Dict[str, Any]:
+    # Streams every event for the org formatted the same way as get_recent_events for the export routes
+    async def export_events(self, org_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields formatted events one at a time."""
+        async for e in self.dac.stream_events(org_id):
+            yield {
+                "eventId": str(e.get("event_id")),
+                "endpointId": str(e.get("endpoint_id")) if e.get("endpoint_id") else None,
+                "eventType": e.get("event_type"),
+                "severity": e.get("severity"),
+                "description": e.get("description"),
+                "foundAt": e.get("found_at").isoformat() if e.get("found_at") else None
+            }
+
+    # Streams the full endpoint inventory for the org with security and private data findings for the export routes
+    async def export_endpoint_inventory(self, org_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields formatted endpoints one at a time."""
+        async for ep in self.dac.stream_endpoint_inventory(org_id):
+            yield {
+                "endpointId": str(ep.get("endpoint_id")),
+                "provider": ep.get("provider"),
+                "name": ep.get("name"),
+                "region": ep.get("region"),
+                "storageBytes": ep.get("storage_bytes"),
+                "sizeGB": float(ep.get("storage_gb", 0)),
+                "onboardedAt": ep.get("onboarded_at").isoformat() if ep.get("onboarded_at") else None,
+                "lastScannedAt": ep.get("last_scanned_at").isoformat() if ep.get("last_scanned_at") else None,
+                "securityStatus": ep.get("security_status"),
+                "issueCount": ep.get("issue_count"),
+                "hasPrivateData": ep.get("has_private"),
+                "dataTypes": ep.get("data_types") or []
+            }
+
+    # Gets storage size in GB for a page of endpoints plus total storage across all endpoints in the org
+    @coalesced
+    async def get_storage_sizes(self, org_id: str, sort: str = "size", provider: Optional[str] = None,
+                                region: Optional[str] = None, security_status: Optional[str] = None,
+                                cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
         """Returns formatted storage sizes with total."""
+        after, limit = page_options(sort, cursor, limit)
         org_name = await self.dac.get_org_name(org_id)
-        sizes = await self.dac.get_storage_sizes(org_id)
+        rows = await self.dac.get_storage_sizes(org_id, sort, provider, region, security_status, after, limit)
+        sizes, next_cursor = split_page(rows, limit, sort)
         total = await self.dac.get_total_storage(org_id)
         
         formatted_endpoints = [
@@ -174,14 +400,53 @@ class Services:
         return {
             "orgName": org_name,
             "endpoints": formatted_endpoints,
-            "totalSizeGB": float(total.get("total_size_gb", 0))
+            "totalSizeGB": float(total.get("total_size_gb", 0)),
+            "nextCursor": next_cursor
+        }
+
+    # Gets the storage and findings trend for the org (or one endpoint) over the last few days from the rollups
+    @coalesced
+    async def get_storage_history(self, org_id: str, endpoint_id: Optional[str] = None, days: int = 30,
+                                  resolution: Optional[str] = None) -> Dict[str, Any]:
+        """Returns formatted storage history points, oldest first."""
+        days = max(1, min(days, 3650))
+        resolution = history_resolution(days, resolution, endpoint_id is None)
+        end = datetime.now(timezone.utc)
+        start = history_bucket_start(end - timedelta(days=days), resolution)
+        org_name = await self.dac.get_org_name(org_id)
+        buckets = history_buckets(start, end, resolution)
+        if endpoint_id is not None:
+            history = endpoint_history_points(await self.dac.get_endpoint_history(org_id, endpoint_id, resolution, start, end), buckets)
+        else:
+            history = org_history_points(await self.dac.get_org_history(org_id, resolution, start, end), buckets)
+
+        formatted_points = [
+            {
+                "bucket": h.get("bucket").isoformat() if h.get("bucket") else None,
+                "storageBytes": h.get("storage_bytes"),
+                "sizeGB": round((h.get("storage_bytes") or 0) / 1024 / 1024 / 1024, 3),
+                "issueCount": h.get("issue_count"),
+                "dataTypes": data_types_from_flags(h.get("data_type_flags"))
+            }
+            for h in history
+        ]
+
+        return {
+            "orgName": org_name,
+            "endpointId": endpoint_id,
+            "resolution": resolution,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "points": formatted_points
         }
 
     # Gets raw total storage data (used internally by get_storage_sizes)
+    @coalesced
     async def get_total_storage(self, org_id: str) -> Dict[str, Any]:
         return await self.dac.get_total_storage(org_id)
 
     # Shows breakdown of cloud providers in use (AWS, Azure, GCP) with endpoint counts and storage
+    @coalesced
     async def get_providers_summary(self, org_id: str) -> Dict[str, Any]:
         """Returns formatted providers summary."""
         org_name = await self.dac.get_org_name(org_id)
@@ -0,0 +1 @@
+# This is intentionally left blank to make migrations a package that can be called
\ No newline at end of file
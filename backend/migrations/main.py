@@ -0,0 +1,76 @@
+import asyncio
+import os
+import re
+import sys
+from typing import List, Tuple
+from app.database.sqlalc_dac import Sql_Alc_DAC
+
+# This is the migration runner - it applies the versioned sql files in sql/migrations that have not been applied yet
+# Each file is named NNNN_description.sql and they are applied in order of the version number
+# Applied versions are recorded in the schema_migrations table so running this again only applies new files
+# Never change a migration that has already been applied somewhere, add a new one instead
+
+# Setting the db connection string - defaults for testing
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    "postgresql+asyncpg://drewdrabek@localhost:5432/postgres"
+)
+
+# The migrations live with the rest of the sql in the repo, this can be changed if they are copied somewhere else (like in docker)
+MIGRATIONS_DIR = os.getenv(
+    "MIGRATIONS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sql", "migrations")
+)
+
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+# Finds all of the migration files and sorts them by version
+# Returns: list of (version, name, path)
+def load_migrations(migrations_dir: str = MIGRATIONS_DIR) -> List[Tuple[str, str, str]]:
+    """Get the migration files in version order."""
+    migrations = []
+    for file_name in sorted(os.listdir(migrations_dir)):
+        match = MIGRATION_FILE.match(file_name)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(migrations_dir, file_name)))
+
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {migrations_dir}")
+    return migrations
+
+
+# Applies every migration that is not in schema_migrations yet, each one in its own transaction
+# If one fails the ones before it stay applied and the error is raised so nothing after it runs
+# Returns: list of versions that were applied
+async def migrate(dac: Sql_Alc_DAC, migrations_dir: str = MIGRATIONS_DIR) -> List[str]:
+    """Apply the pending migrations."""
+    applied = await dac.get_applied_migrations()
+    newly_applied = []
+    for version, name, path in load_migrations(migrations_dir):
+        if version in applied:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            sql_script = f.read()
+        print(f"Applying migration {version}_{name}")
+        await dac.execute_script(sql_script, version, name)
+        newly_applied.append(version)
+    return newly_applied
+
+
+async def main():
+    dac = Sql_Alc_DAC(DATABASE_URL)
+    await dac.connect()
+    try:
+        applied = await migrate(dac)
+        print(f"Applied {len(applied)} migrations" if applied else "Database is up to date")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+    finally:
+        await dac.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
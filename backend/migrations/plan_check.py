@@ -0,0 +1,465 @@
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database.sqlalc_dac import ENDPOINT_SORTS, Sql_Alc_DAC, data_types_from_flags
+from app.services.services import endpoint_history_points, history_bucket_start, history_buckets, org_history_points
+from migrations.main import DATABASE_URL, migrate
+
+# This is the query plan regression check for the dac
+# It applies the migrations to a local database, seeds it with a lot of fake data, and then runs EXPLAIN on every dac query
+# Each query has the indexes it is expected to use and it fails if the plan uses a different one, does a sequential scan
+# or the EXPLAIN errors, and the endpoint listings also fail if there is a Sort node (the index has to give the page order)
+# That way a missing or unused index, a plan that changed shape or broken sql is caught before deploy
+# Every query is still checked after a failure so one bad statement does not hide the rest
+# The seed data is added in a transaction that is rolled back at the end so the database is left the way it was
+# After that the endpoint and org history is checked by running the dac writes and reads at set times (see check_history)
+
+# Run it from the backend directory against a local database (not a real one):
+# DATABASE_URL=postgresql+asyncpg://user@localhost:5432/plancheck python -m migrations.plan_check
+
+# How much data to seed - the planner only picks indexes once the tables are big enough
+# The defaults are 100k endpoints and 1M events, with fewer orgs the joins to policies and private_data are small enough that a seq scan is cheaper
+ORGS = int(os.getenv("PLAN_CHECK_ORGS", "1000"))
+ENDPOINTS_PER_ORG = int(os.getenv("PLAN_CHECK_ENDPOINTS_PER_ORG", "100"))
+EVENTS_PER_ENDPOINT = int(os.getenv("PLAN_CHECK_EVENTS_PER_ENDPOINT", "10"))
+OBJECTS_PER_ENDPOINT = int(os.getenv("PLAN_CHECK_OBJECTS_PER_ENDPOINT", "5"))
+
+# Each of these is run on its own inside the seed transaction
+SEED_SQL = [
+    """
+    INSERT INTO organizations (org_name)
+    SELECT 'plan-check-org-' || g FROM generate_series(1, :orgs) g;
+    """,
+    # Most endpoints were scanned in the last day like they would be with the queue adder running, a few are overdue or never scanned
+    """
+    INSERT INTO endpoints (org_id, provider, name, region, storage_bytes, onboarded_at, last_scanned_at)
+    SELECT o.org_id,
+           (ARRAY['AWS', 'Azure', 'GCP'])[1 + g % 3],
+           'bucket-' || g,
+           (ARRAY['us-east-1', 'us-east-2', 'us-west-2', 'eastus', 'europe-west1'])[1 + g % 5],
+           (random() * 1e12)::bigint,
+           now() - interval '90 days',
+           CASE WHEN g % 50 = 0 THEN NULL
+                WHEN g % 50 = 1 THEN now() - interval '3 days'
+                ELSE now() - random() * interval '20 hours' END
+    FROM organizations o
+    CROSS JOIN generate_series(1, :endpoints) g
+    WHERE o.org_name LIKE 'plan-check-org-%';
+    """,
+    """
+    INSERT INTO policies (endpoint_id, security_status, issue_count, last_scanned_at)
+    SELECT e.endpoint_id, CASE WHEN random() < 0.2 THEN 'insecure' ELSE 'secure' END, (random() * 5)::int, e.last_scanned_at
+    FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+    WHERE o.org_name LIKE 'plan-check-org-%';
+    """,
+    # insert_policy keeps the copy of the status on endpoints in step so the seed does the same
+    """
+    UPDATE endpoints e SET security_status = p.security_status
+    FROM policies p
+    WHERE p.endpoint_id = e.endpoint_id;
+    """,
+    """
+    INSERT INTO private_data (endpoint_id, has_private, data_types, found_at)
+    SELECT e.endpoint_id, true, '["SSN"]'::jsonb, e.last_scanned_at
+    FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+    WHERE o.org_name LIKE 'plan-check-org-%' AND random() < 0.3;
+    """,
+    """
+    INSERT INTO events (endpoint_id, org_id, event_type, description, severity, found_at)
+    SELECT e.endpoint_id, e.org_id, 'security_issue', 'plan check', 'low', now() - g * interval '1 hour'
+    FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+    CROSS JOIN generate_series(1, :events) g
+    WHERE o.org_name LIKE 'plan-check-org-%';
+    """,
+    """
+    INSERT INTO object_manifest (endpoint_id, object_key, size_bytes, etag, data_types, result_hash)
+    SELECT e.endpoint_id, 'object-' || g, 1024, md5(g::text), '[]'::jsonb, md5('[]')
+    FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+    CROSS JOIN generate_series(1, :objects) g
+    WHERE o.org_name LIKE 'plan-check-org-%';
+    """,
+    # Daily history for every endpoint, the hourly and monthly rollups are the same shape
+    """
+    INSERT INTO endpoint_rollups (endpoint_id, resolution, bucket, storage_bytes, issue_count, data_type_flags, samples)
+    SELECT e.endpoint_id, 'day', date_trunc('day', now() - g * interval '1 day', 'UTC'), e.storage_bytes, 0, 0, 1
+    FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+    CROSS JOIN generate_series(1, :events) g
+    WHERE o.org_name LIKE 'plan-check-org-%';
+    """,
+    """
+    INSERT INTO endpoint_samples (endpoint_id, sampled_at, storage_bytes)
+    SELECT e.endpoint_id, now() - g * interval '1 day', e.storage_bytes
+    FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+    CROSS JOIN generate_series(1, :events) g
+    WHERE o.org_name LIKE 'plan-check-org-%';
+    """,
+    # Org history changes for every day and month, like every org had something change in each of them
+    """
+    INSERT INTO org_rollups (org_id, resolution, bucket, storage_bytes_delta, issue_count_delta, data_type_deltas)
+    SELECT o.org_id, r.resolution, date_trunc(r.resolution, now() - g * interval '1 day', 'UTC'), 1024, 0, '{}'
+    FROM organizations o
+    CROSS JOIN (VALUES ('day'), ('month')) AS r(resolution)
+    CROSS JOIN generate_series(1, 400) g
+    WHERE o.org_name LIKE 'plan-check-org-%'
+    ON CONFLICT DO NOTHING;
+    """,
+    "ANALYZE organizations, endpoints, policies, private_data, events, object_manifest, endpoint_samples, endpoint_rollups, org_rollups;",
+]
+
+# Picks an org and endpoint from the seed data to use as the params for the queries
+SAMPLE_SQL = """
+SELECT e.org_id, e.endpoint_id, e.name, e.storage_bytes, e.last_scanned_at
+FROM endpoints e JOIN organizations o ON o.org_id = e.org_id
+WHERE o.org_name = 'plan-check-org-1' AND e.last_scanned_at IS NOT NULL
+ORDER BY e.name
+LIMIT 1;
+"""
+
+
+# A dac that records the sql for each call instead of running it
+# This way the check always uses the exact sql that is in the dac so the two can not get out of sync
+class CapturingDAC(Sql_Alc_DAC):
+
+    def __init__(self):
+        super().__init__(DATABASE_URL)
+        self.captured: List[Tuple[str, Dict[str, Any]]] = []
+
+    async def query(self, sql_query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        self.captured.append((sql_query, params or {}))
+        return []
+
+    async def execute_many(self, sql_query: str, params_list: List[Dict[str, Any]]) -> None:
+        self.captured.append((sql_query, params_list[0] if params_list else {}))
+
+    async def stream(self, sql_query: str, params: Optional[Dict[str, Any]] = None, batch_size: int = 1000):
+        self.captured.append((sql_query, params or {}))
+        return
+        yield
+
+    async def execute_script(self, sql_script: str, version: Optional[str] = None, name: Optional[str] = None) -> None:
+        pass
+
+
+# The filters the endpoint listings are checked with - (label, index part, provider, region, security_status)
+# The index part is what the filter adds to the idx_endpoints_org_* index name
+LISTING_FILTERS = [
+    ("", "", None, None, None),
+    (" provider", "provider_", "AWS", None, None),
+    (" region", "region_", None, "us-east-1", None),
+    (" security_status", "status_", None, None, "insecure"),
+]
+
+# The end of the idx_endpoints_org_* index name for each sort in ENDPOINT_SORTS
+SORT_INDEXES = {"name": "name", "size": "size", "last_scanned": "scanned"}
+
+# The listing queries have to come back in index order, a Sort node in their plan fails the check
+LISTING_METHODS = ("get_endpoints_for_org", "get_policies_summary", "get_storage_sizes")
+
+
+# Every named dac query with the args to call it with and the indexes its plan should use
+# Each expected entry is an index name or a tuple of index names where any one of them is fine (like for a count
+# that can be answered from any of the org indexes), every entry has to be in the plan and no other index can be
+# The endpoint listings are checked with every sort and filter since each of those has its own index
+def named_queries(sample: Dict[str, Any]) -> List[Tuple[str, str, tuple, tuple]]:
+    org_id, endpoint_id = str(sample["org_id"]), str(sample["endpoint_id"])
+    history_end = datetime.now(timezone.utc)
+    history_start = history_bucket_start(history_end - timedelta(days=30), "day")
+    queries = [
+        ("create_endpoint", "create_endpoint", (org_id, "AWS", "plan-check-new", "us-east-1", None), ()),
+        ("delete_endpoint", "delete_endpoint", (endpoint_id, org_id), ("endpoints_pkey", "uq_policy_per_endpoint", "uq_privatedata_per_endpoint")),
+        ("get_policy_detail", "get_policy_detail", (endpoint_id, org_id), ("endpoints_pkey", "uq_policy_per_endpoint")),
+        ("get_private_data_summary", "get_private_data_summary", (org_id,), ("idx_endpoints_org_name", "uq_privatedata_per_endpoint")),
+        ("get_events_count", "get_events_count", (org_id,), ("idx_events_org_found",)),
+        ("get_recent_events", "get_recent_events", (org_id, 50), ("idx_events_org_found",)),
+        ("stream_events", "stream_events", (org_id,), ("idx_events_org_found",)),
+        ("stream_endpoint_inventory", "stream_endpoint_inventory", (org_id,), ("idx_endpoints_org_name", "uq_policy_per_endpoint", "uq_privatedata_per_endpoint")),
+        ("get_total_storage", "get_total_storage", (org_id,), ("idx_endpoints_org_size",)),
+        ("get_providers_summary", "get_providers_summary", (org_id,), ("idx_endpoints_org_provider_size",)),
+        ("insert_policy", "insert_policy", (endpoint_id, "secure", 0), ("endpoints_pkey",)),
+        ("insert_private_data", "insert_private_data", (endpoint_id, False, []), ("endpoints_pkey",)),
+        ("insert_event", "insert_event", (endpoint_id, org_id, "security_issue", "plan check", "low"), ()),
+        ("update_endpoint_storage", "update_endpoint_storage", (endpoint_id, 1024), ("endpoints_pkey",)),
+        ("get_org_name", "get_org_name", (org_id,), ("organizations_pkey",)),
+        ("get_endpoints_needing_scan", "get_endpoints_needing_scan", (), ("idx_endpoints_last_scanned",)),
+        ("update_endpoint_last_scanned", "update_endpoint_last_scanned", (endpoint_id,), ("endpoints_pkey",)),
+        ("get_object_manifest", "get_object_manifest", (endpoint_id,), ("object_manifest_pkey",)),
+        ("upsert_manifest_entries", "upsert_manifest_entries", (endpoint_id, [{"object_key": "object-1", "size": 1, "etag": "x", "data_types": [], "result_hash": "x"}]), ()),
+        ("delete_manifest_entries", "delete_manifest_entries", (endpoint_id, ["object-1"]), ("object_manifest_pkey",)),
+        ("get_endpoint_history", "get_endpoint_history", (org_id, endpoint_id, "day", history_start, history_end), ("endpoint_rollups_pkey", "endpoints_pkey")),
+        ("get_org_history", "get_org_history", (org_id, "day", history_start, history_end), ("org_rollups_pkey",)),
+        ("prune_endpoint_history", "prune_endpoint_history", (), ("idx_endpoint_samples_sampled_at", "idx_endpoint_rollups_resolution_bucket", "idx_org_rollups_resolution_bucket")),
+    ]
+    for method in LISTING_METHODS:
+        for sort, (column, _) in ENDPOINT_SORTS.items():
+            cursor = (sample[column], endpoint_id)
+            for label, index_part, provider, region, status in LISTING_FILTERS:
+                expected = (f"idx_endpoints_org_{index_part}{SORT_INDEXES[sort]}",)
+                if method == "get_policies_summary":
+                    expected += ("uq_policy_per_endpoint",)
+                queries.append((f"{method} sort={sort}{label}", method, (org_id, sort, provider, region, status, None, 100), expected))
+                queries.append((f"{method} sort={sort}{label} cursor", method, (org_id, sort, provider, region, status, cursor, 100), expected))
+    for label, index_part, provider, region, status in LISTING_FILTERS:
+        expected = (tuple(f"idx_endpoints_org_{index_part}{suffix}" for suffix in SORT_INDEXES.values()),)
+        queries.append((f"count_endpoints{label}", "count_endpoints", (org_id, provider, region, status), expected))
+    return queries
+
+
+# Walks the json plan and collects every node as (node type, relation or index name)
+def plan_nodes(plan: Dict[str, Any]) -> List[Tuple[str, str]]:
+    nodes = [(plan["Node Type"], plan.get("Index Name") or plan.get("Relation Name") or "")]
+    for child in plan.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+# Compares the nodes of every statement a query ran with what it is expected to use
+# Returns: a list of what is wrong with the plan, empty if it is the expected one
+def plan_problems(nodes: List[Tuple[str, str]], expected: tuple, listing: bool) -> List[str]:
+    problems = []
+    used = {name for node_type, name in nodes if "Index" in node_type}
+    alternatives = [(entry,) if isinstance(entry, str) else entry for entry in expected]
+    for entry in alternatives:
+        if not used.intersection(entry):
+            problems.append(f"expected {' or '.join(entry)}")
+    unexpected = used - {name for entry in alternatives for name in entry}
+    if unexpected:
+        problems.append(f"unexpected {', '.join(sorted(unexpected))}")
+    if any(node_type == "Seq Scan" for node_type, _ in nodes):
+        problems.append("sequential scan")
+    if listing and any(node_type in ("Sort", "Incremental Sort") for node_type, _ in nodes):
+        problems.append("sort")
+    return problems
+
+
+async def check_plans() -> bool:
+    engine = create_async_engine(DATABASE_URL)
+    failures = 0
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                print(f"Seeding {ORGS} orgs x {ENDPOINTS_PER_ORG} endpoints...")
+                for sql in SEED_SQL:
+                    await conn.execute(text(sql), {"orgs": ORGS, "endpoints": ENDPOINTS_PER_ORG, "events": EVENTS_PER_ENDPOINT, "objects": OBJECTS_PER_ENDPOINT})
+                sample = dict((await conn.execute(text(SAMPLE_SQL))).mappings().one())
+
+                for label, method, args, expected in named_queries(sample):
+                    capture = CapturingDAC()
+                    try:
+                        result = getattr(capture, method)(*args)
+                        if hasattr(result, "__aiter__"):
+                            async for _ in result:
+                                pass
+                        else:
+                            await result
+                    except Exception as e:
+                        failures += 1
+                        print(f"FAIL {label}: could not build the query: {e}")
+                        continue
+
+                    # The expected indexes are for the whole call so the nodes of all its statements are checked together
+                    nodes: List[Tuple[str, str]] = []
+                    errored = False
+                    for sql, params in capture.captured:
+                        # Each EXPLAIN runs in a savepoint so one that errors does not abort the seed transaction for the rest
+                        try:
+                            async with conn.begin_nested():
+                                row = (await conn.execute(text("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(";")), params)).scalar_one()
+                        except Exception as e:
+                            failures += 1
+                            errored = True
+                            print(f"FAIL {label}: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}")
+                            break
+                        nodes.extend(plan_nodes((json.loads(row) if isinstance(row, str) else row)[0]["Plan"]))
+                    if errored:
+                        continue
+
+                    problems = plan_problems(nodes, expected, method in LISTING_METHODS)
+                    scans = ", ".join(f"{t} on {n}" if n else t for t, n in nodes if "Scan" in t or "Sort" in t) or "no scans"
+                    if problems:
+                        failures += 1
+                        print(f"FAIL {label}: {'; '.join(problems)} ({scans})")
+                    else:
+                        print(f"ok   {label}: {scans}")
+            finally:
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+
+    print(f"{failures} queries failed (unexpected plans or errors)" if failures else "All query plans use their expected indexes")
+    return failures == 0
+
+
+# A dac that runs its queries on the connection of the check so they are part of its transaction and get rolled back with it
+class ConnectionDAC(Sql_Alc_DAC):
+
+    def __init__(self, conn):
+        super().__init__(DATABASE_URL)
+        self.conn = conn
+
+    async def query(self, sql_query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        result = await self.conn.execute(text(sql_query), params or {})
+        return [dict(r) for r in result.mappings().all()]
+
+
+# now() for the history check - plan_check_clock is put before pg_catalog in the search path so the dac sql calls this one
+# and the writes can be made at any time by setting plan_check.now
+CLOCK_SQL = [
+    "CREATE SCHEMA plan_check_clock;",
+    """
+    CREATE FUNCTION plan_check_clock.now() RETURNS timestamptz
+    LANGUAGE sql STABLE AS $$ SELECT CAST(current_setting('plan_check.now') AS timestamptz) $$;
+    """,
+    "SET LOCAL search_path = plan_check_clock, pg_catalog, public;",
+]
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+# Turns history points into (bucket date, storage, issues, data types) so they are easy to compare
+def summarize(points: List[Dict[str, Any]]) -> List[Tuple[str, Any, Any, List[str]]]:
+    return [(p["bucket"].isoformat()[:16], p["storage_bytes"], p["issue_count"], data_types_from_flags(p["data_type_flags"])) for p in points]
+
+
+# Checks the endpoint and org history end to end against the database
+# Two endpoints get written to across an hour, day and month boundary (31 Jan 23:30 -> 1 Feb 00:10), one gets a
+# storage -> policy -> private data sequence in a single hour and one is deleted at the end
+# Then both histories are read like get_storage_history does and compared to what they should be
+# Returns: how many checks failed
+async def check_history() -> int:
+    engine = create_async_engine(DATABASE_URL)
+    failures = 0
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                for sql in CLOCK_SQL:
+                    await conn.execute(text(sql))
+                dac = ConnectionDAC(conn)
+
+                async def at(when: datetime):
+                    await conn.execute(text("SELECT set_config('plan_check.now', :now, true);"), {"now": when.isoformat()})
+
+                await at(utc(2026, 1, 31, 23, 0))
+                org_id = str((await conn.execute(text(
+                    "INSERT INTO organizations (org_name) VALUES ('plan-check-history') RETURNING org_id;"))).scalar_one())
+                a = str((await dac.create_endpoint(org_id, "AWS", "history-a", "us-east-1", None))["endpoint_id"])
+                b = str((await dac.create_endpoint(org_id, "AWS", "history-b", "us-east-1", None))["endpoint_id"])
+
+                await at(utc(2026, 1, 31, 23, 30))
+                await dac.update_endpoint_storage(a, 100)
+                await dac.insert_policy(a, "insecure", 2)
+                await dac.insert_private_data(a, True, ["SSN"])
+                await dac.update_endpoint_storage(b, 50)
+                await at(utc(2026, 2, 1, 0, 10))
+                await dac.update_endpoint_storage(a, 80)
+                await at(utc(2026, 2, 1, 0, 40))
+                await dac.update_endpoint_storage(b, 70)
+                await dac.insert_policy(b, "insecure", 5)
+                await dac.insert_private_data(b, True, ["email"])
+
+                # All three writes to b landed in the same hour, the rollup row has to keep each of their values
+                rollup = (await conn.execute(text("""
+                    SELECT storage_bytes, issue_count, data_type_flags, samples FROM endpoint_rollups
+                    WHERE endpoint_id = :endpoint_id AND resolution = 'hour' AND bucket = :bucket;
+                """), {"endpoint_id": b, "bucket": utc(2026, 2, 1, 0)})).mappings().one()
+                same_hour = (rollup["storage_bytes"], rollup["issue_count"], data_types_from_flags(rollup["data_type_flags"]), rollup["samples"])
+
+                await at(utc(2026, 2, 3, 12, 0))
+                await dac.insert_policy(a, "secure", 0)
+                await at(utc(2026, 2, 5, 9, 0))
+                await dac.delete_endpoint(b, org_id)
+
+                def expect(label: str, actual: Any, expected: Any) -> None:
+                    nonlocal failures
+                    if actual != expected:
+                        failures += 1
+                        print(f"FAIL history {label}: expected {expected!r} but got {actual!r}")
+                    else:
+                        print(f"ok   history {label}")
+
+                async def endpoint_points(endpoint_id: str, resolution: str, start: datetime, end: datetime):
+                    rows = await dac.get_endpoint_history(org_id, endpoint_id, resolution, start, end)
+                    return summarize(endpoint_history_points(rows, history_buckets(start, end, resolution)))
+
+                async def org_points(resolution: str, start: datetime, end: datetime):
+                    rows = await dac.get_org_history(org_id, resolution, start, end)
+                    return summarize(org_history_points(rows, history_buckets(start, end, resolution)))
+
+                expect("storage -> policy -> private data in one hour", same_hour, (70, 5, ["email"], 3))
+
+                # The range starts part way into 31 Jan, the bucket it is in still has to be the first point
+                start = history_bucket_start(utc(2026, 1, 31, 23, 45), "day")
+                expect("first partial bucket start", start, utc(2026, 1, 31))
+                end = utc(2026, 2, 6)
+
+                expect("endpoint a daily, carried forward", await endpoint_points(a, "day", start, end), [
+                    ("2026-01-31T00:00", 100, 2, ["SSN"]),
+                    ("2026-02-01T00:00", 80, 2, ["SSN"]),
+                    ("2026-02-02T00:00", 80, 2, ["SSN"]),
+                    ("2026-02-03T00:00", 80, 0, ["SSN"]),
+                    ("2026-02-04T00:00", 80, 0, ["SSN"]),
+                    ("2026-02-05T00:00", 80, 0, ["SSN"]),
+                ])
+                expect("endpoint a monthly", await endpoint_points(a, "month", utc(2026, 1, 1), utc(2026, 3, 1)), [
+                    ("2026-01-01T00:00", 100, 2, ["SSN"]),
+                    ("2026-02-01T00:00", 80, 0, ["SSN"]),
+                ])
+                expect("endpoint a daily from before start", await endpoint_points(a, "day", utc(2026, 2, 2), utc(2026, 2, 4)), [
+                    ("2026-02-02T00:00", 80, 2, ["SSN"]),
+                    ("2026-02-03T00:00", 80, 0, ["SSN"]),
+                ])
+
+                expect("org daily, carried forward and delete", await org_points("day", start, end), [
+                    ("2026-01-31T00:00", 150, 2, ["SSN"]),
+                    ("2026-02-01T00:00", 150, 7, ["SSN", "email"]),
+                    ("2026-02-02T00:00", 150, 7, ["SSN", "email"]),
+                    ("2026-02-03T00:00", 150, 5, ["SSN", "email"]),
+                    ("2026-02-04T00:00", 150, 5, ["SSN", "email"]),
+                    ("2026-02-05T00:00", 80, 0, ["SSN"]),
+                ])
+                expect("org hourly from the months and days before start", await org_points("hour", utc(2026, 2, 1, 0), utc(2026, 2, 1, 2)), [
+                    ("2026-02-01T00:00", 150, 7, ["SSN", "email"]),
+                    ("2026-02-01T01:00", 150, 7, ["SSN", "email"]),
+                ])
+                expect("org daily from the month and days before start", await org_points("day", utc(2026, 2, 4), utc(2026, 2, 6)), [
+                    ("2026-02-04T00:00", 150, 5, ["SSN", "email"]),
+                    ("2026-02-05T00:00", 80, 0, ["SSN"]),
+                ])
+                expect("org monthly", await org_points("month", utc(2026, 1, 1), utc(2026, 3, 1)), [
+                    ("2026-01-01T00:00", 150, 2, ["SSN"]),
+                    ("2026-02-01T00:00", 80, 0, ["SSN"]),
+                ])
+            finally:
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+
+    print(f"{failures} history checks failed" if failures else "History checks passed")
+    return failures
+
+
+async def main():
+    dac = Sql_Alc_DAC(DATABASE_URL)
+    await dac.connect()
+    try:
+        await migrate(dac)
+    finally:
+        await dac.disconnect()
+
+    plans_ok = await check_plans()
+    history_failures = await check_history()
+    if not plans_ok or history_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
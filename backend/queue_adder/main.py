@@ -17,6 +17,9 @@ DATABASE_URL = os.getenv(
 
 dac = Sql_Alc_DAC(DATABASE_URL, echo=True)
 
+# The endpoint history is only pruned once a day since the shortest thing that is kept is 30 days of samples
+PRUNE_INTERVAL_SECONDS = 24 * 60 * 60
+
 # Function to test the database connection to make sure that we can connect to it
 async def test_database_connection():
     """Test the database connection on startup."""
@@ -97,6 +100,9 @@ async def main():
     print("Checking for endpoints that need scanning every 2 minutes...")
     print("Queueing endpoints that haven't been scanned in the last 24 hours")
 
+    # None so the history is pruned on the first loop after starting
+    last_pruned_at = None
+
     try:
         while True:
             try:
@@ -106,6 +112,13 @@ async def main():
                 count = await process_endpoints()
                 print(f"Processed and queued {count} endpoints")
 
+                # Clearing out endpoint history that is older than what is kept for each resolution
+                now = asyncio.get_running_loop().time()
+                if last_pruned_at is None or now - last_pruned_at >= PRUNE_INTERVAL_SECONDS:
+                    pruned = await dac.prune_endpoint_history()
+                    last_pruned_at = now
+                    print(f"Pruned endpoint history: {pruned}")
+
             except Exception as e:
                 print(f"Error in main loop: {e}")
 
@@ -0,0 +1,54 @@
+-- The tables from sql/README.md as the first migration
+-- IF NOT EXISTS is used so a database that was already set up by hand from the README can be moved over to the migrations
+
+-- organizations information here just stores what we need to store about the org
+CREATE TABLE IF NOT EXISTS organizations (
+  org_id UUID PRIMARY KEY DEFAULT uuidv7(),
+  org_name TEXT NOT NULL UNIQUE,
+  join_date DATE DEFAULT CURRENT_DATE
+);
+
+-- endpoints, the credentials are stored as an arn to the secret and pulled in when needed
+CREATE TABLE IF NOT EXISTS endpoints (
+  endpoint_id UUID PRIMARY KEY DEFAULT uuidv7(),
+  org_id UUID NOT NULL REFERENCES organizations(org_id) ON DELETE CASCADE,
+  provider TEXT NOT NULL,
+  name TEXT NOT NULL,
+  region TEXT,
+  storage_bytes BIGINT DEFAULT 0 NOT NULL,
+  credentials_arn TEXT,
+  onboarded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_scanned_at TIMESTAMPTZ,
+  CONSTRAINT uq_endpoint_per_org UNIQUE (org_id, provider, name)
+);
+
+-- policy information - we dont store the policy just what we find
+CREATE TABLE IF NOT EXISTS policies (
+  policy_id UUID PRIMARY KEY DEFAULT uuidv7(),
+  endpoint_id UUID NOT NULL REFERENCES endpoints(endpoint_id) ON DELETE CASCADE,
+  security_status TEXT DEFAULT 'unknown',
+  issue_count INT DEFAULT 0,
+  last_scanned_at TIMESTAMPTZ,
+  CONSTRAINT uq_policy_per_endpoint UNIQUE (endpoint_id)
+);
+
+-- private data found in an endpoint
+CREATE TABLE IF NOT EXISTS private_data (
+  private_id UUID PRIMARY KEY DEFAULT uuidv7(),
+  endpoint_id UUID NOT NULL REFERENCES endpoints(endpoint_id) ON DELETE CASCADE,
+  has_private BOOLEAN NOT NULL DEFAULT false,
+  data_types JSONB DEFAULT '[]'::jsonb,
+  found_at TIMESTAMPTZ,
+  CONSTRAINT uq_privatedata_per_endpoint UNIQUE (endpoint_id)
+);
+
+-- events table
+CREATE TABLE IF NOT EXISTS events (
+  event_id UUID PRIMARY KEY DEFAULT uuidv7(),
+  endpoint_id UUID REFERENCES endpoints(endpoint_id) ON DELETE SET NULL,
+  org_id UUID NOT NULL REFERENCES organizations(org_id) ON DELETE CASCADE,
+  event_type TEXT NOT NULL,
+  description TEXT,
+  severity TEXT DEFAULT 'low',
+  found_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
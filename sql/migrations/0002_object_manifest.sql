@@ -0,0 +1,12 @@
+-- object manifest for the incremental scan (app/scanning/manifest.py)
+-- one row for every object that was scanned in an endpoint, the primary key also covers the per endpoint lookups
+CREATE TABLE IF NOT EXISTS object_manifest (
+  endpoint_id UUID NOT NULL REFERENCES endpoints(endpoint_id) ON DELETE CASCADE,
+  object_key TEXT NOT NULL,
+  size_bytes BIGINT NOT NULL DEFAULT 0,
+  etag TEXT,
+  data_types JSONB DEFAULT '[]'::jsonb,
+  result_hash TEXT,
+  scanned_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (endpoint_id, object_key)
+);
@@ -0,0 +1,18 @@
+-- indexes for the paged endpoint listings (/api/endpoints, /api/security/policies and /api/storage/size)
+-- one for every sort (name, size, last_scanned) with no filter, the provider filter and the region filter
+-- these match the ORDER BY in Sql_Alc_DAC._endpoint_page_sql so a page is read straight off the index
+
+-- sort=name
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_name ON endpoints (org_id, name, endpoint_id);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_provider_name ON endpoints (org_id, provider, name, endpoint_id);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_region_name ON endpoints (org_id, region, name, endpoint_id);
+
+-- sort=size (largest first) - this is also the endpoints(org_id, storage_bytes) index for get_total_storage
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_size ON endpoints (org_id, storage_bytes DESC, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_provider_size ON endpoints (org_id, provider, storage_bytes DESC, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_region_size ON endpoints (org_id, region, storage_bytes DESC, endpoint_id DESC);
+
+-- sort=last_scanned (most recent first, never scanned last)
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_scanned ON endpoints (org_id, last_scanned_at DESC NULLS LAST, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_provider_scanned ON endpoints (org_id, provider, last_scanned_at DESC NULLS LAST, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_region_scanned ON endpoints (org_id, region, last_scanned_at DESC NULLS LAST, endpoint_id DESC);
@@ -0,0 +1,13 @@
+-- indexes for the rest of the dac queries that were being done with sequential scans
+
+-- get_recent_events (found_at DESC is a backwards scan), get_events_count and stream_events
+CREATE INDEX IF NOT EXISTS idx_events_org_found ON events (org_id, found_at, event_id);
+
+-- events.endpoint_id is ON DELETE SET NULL so deleting an endpoint has to find its events
+CREATE INDEX IF NOT EXISTS idx_events_endpoint ON events (endpoint_id);
+
+-- get_endpoints_needing_scan (queue adder) - never scanned first then oldest
+CREATE INDEX IF NOT EXISTS idx_endpoints_last_scanned ON endpoints (last_scanned_at ASC NULLS FIRST);
+
+-- get_providers_summary groups by provider and sums storage_bytes so this can be answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_provider_storage ON endpoints (org_id, provider) INCLUDE (storage_bytes);
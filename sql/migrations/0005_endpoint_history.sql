@@ -0,0 +1,31 @@
+-- storage and findings history for the endpoints (/api/storage/history)
+-- update_endpoint_storage, insert_policy and insert_private_data overwrite the current values so these keep the history
+
+-- append only log of every write, a column is null if that write did not change it
+-- data_type_flags has the fixed bit from DATA_TYPES in the dac for each data type so a sample is a fixed small size
+-- this is only kept for a short time since the rollups have everything the api needs
+CREATE TABLE IF NOT EXISTS endpoint_samples (
+  endpoint_id UUID NOT NULL REFERENCES endpoints(endpoint_id) ON DELETE CASCADE,
+  sampled_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  storage_bytes BIGINT,
+  issue_count INT,
+  data_type_flags INT
+);
+CREATE INDEX IF NOT EXISTS idx_endpoint_samples_sampled_at ON endpoint_samples (sampled_at);
+
+-- the samples downsampled to one row per endpoint per hour, day and month
+-- these are updated in the same statement as the sample is added so there is no batch job to run
+-- storage_bytes, issue_count and data_type_flags are the last value written in the bucket, null if none was
+-- buckets with no value are filled from the buckets before them when read
+CREATE TABLE IF NOT EXISTS endpoint_rollups (
+  endpoint_id UUID NOT NULL REFERENCES endpoints(endpoint_id) ON DELETE CASCADE,
+  resolution TEXT NOT NULL, -- hour, day or month
+  bucket TIMESTAMPTZ NOT NULL, -- start of the hour, day or month in utc
+  storage_bytes BIGINT,
+  issue_count INT,
+  data_type_flags INT,
+  samples INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (endpoint_id, resolution, bucket)
+);
+-- for pruning old hourly and daily rollups
+CREATE INDEX IF NOT EXISTS idx_endpoint_rollups_resolution_bucket ON endpoint_rollups (resolution, bucket);
@@ -0,0 +1,15 @@
+-- the sort=last_scanned listings sort on COALESCE(last_scanned_at, '-infinity') instead of last_scanned_at NULLS LAST
+-- never scanned endpoints still come last (most recent first) but the keyset is one row comparison that the index can start at
+-- with the nullable column the cursor needed an IS NULL OR (...) condition and every page was read from the start of the org
+-- these replace the last_scanned indexes from 0003 and have to match the expression in Sql_Alc_DAC._endpoint_page_sql exactly
+
+DROP INDEX IF EXISTS idx_endpoints_org_scanned;
+DROP INDEX IF EXISTS idx_endpoints_org_provider_scanned;
+DROP INDEX IF EXISTS idx_endpoints_org_region_scanned;
+
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_scanned
+  ON endpoints (org_id, COALESCE(last_scanned_at, CAST('-infinity' AS timestamptz)) DESC, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_provider_scanned
+  ON endpoints (org_id, provider, COALESCE(last_scanned_at, CAST('-infinity' AS timestamptz)) DESC, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_region_scanned
+  ON endpoints (org_id, region, COALESCE(last_scanned_at, CAST('-infinity' AS timestamptz)) DESC, endpoint_id DESC);
@@ -0,0 +1,16 @@
+-- the security status is copied onto endpoints so the security_status filter on the endpoint listings has its own keyset indexes
+-- policies is still where the status comes from, insert_policy updates endpoints.security_status in the same statement
+-- before this the filter was checked on the policies row of every endpoint in the org, so a rare status could read the whole org for one page
+
+ALTER TABLE endpoints ADD COLUMN IF NOT EXISTS security_status TEXT NOT NULL DEFAULT 'unknown';
+
+UPDATE endpoints e
+SET security_status = COALESCE(p.security_status, 'unknown')
+FROM policies p
+WHERE p.endpoint_id = e.endpoint_id;
+
+-- one for every sort with the security_status filter, when provider or region is passed as well they are checked on the rows these return
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_status_name ON endpoints (org_id, security_status, name, endpoint_id);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_status_size ON endpoints (org_id, security_status, storage_bytes DESC, endpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_endpoints_org_status_scanned
+  ON endpoints (org_id, security_status, COALESCE(last_scanned_at, CAST('-infinity' AS timestamptz)) DESC, endpoint_id DESC);
@@ -0,0 +1,3 @@
+-- idx_endpoints_org_provider_storage from 0004 is covered by idx_endpoints_org_provider_size (org_id, provider, storage_bytes DESC, endpoint_id DESC)
+-- get_providers_summary is answered from that one just the same, and every extra index on storage_bytes makes update_endpoint_storage rewrite one more index entry
+DROP INDEX IF EXISTS idx_endpoints_org_provider_storage;
@@ -0,0 +1,52 @@
+-- org wide storage and findings history for /api/storage/history without an endpoint_id
+-- reading the org history from endpoint_rollups meant carrying every endpoint forward into every bucket, which costs endpoints x buckets per request
+-- instead every storage, policy, private data write and endpoint delete adds how much it changed the org totals to the bucket it falls in
+-- the totals at a bucket are everything added up to it, so a chart is a primary key range scan of the buckets plus the months before it
+-- these are deltas and not running totals so concurrent writes only ever add to a row and can never lose each other's change
+
+-- data_type_deltas has one entry for each bit in DATA_TYPES in the dac (1 based, so entry b + 1 is bit b)
+-- it is the change in how many endpoints have that data type, an org has a data type while the total is above 0
+CREATE TABLE IF NOT EXISTS org_rollups (
+  org_id UUID NOT NULL REFERENCES organizations(org_id) ON DELETE CASCADE,
+  resolution TEXT NOT NULL, -- hour, day or month
+  bucket TIMESTAMPTZ NOT NULL, -- start of the hour, day or month in utc
+  storage_bytes_delta BIGINT NOT NULL DEFAULT 0,
+  issue_count_delta INT NOT NULL DEFAULT 0,
+  data_type_deltas INT[] NOT NULL DEFAULT '{}',
+  PRIMARY KEY (org_id, resolution, bucket)
+);
+-- for pruning old hourly and daily rollups
+CREATE INDEX IF NOT EXISTS idx_org_rollups_resolution_bucket ON org_rollups (resolution, bucket);
+
+-- starts every org off with what it has now so the totals after this are right
+-- the data type bits are the ones in DATA_TYPES in the dac when this was written, anything else is other (30)
+WITH endpoint_flags AS (
+  SELECT e.org_id, e.storage_bytes, COALESCE(p.issue_count, 0) AS issue_count,
+         COALESCE((SELECT bit_or(1 << COALESCE(m.bit, 30))
+                   FROM jsonb_array_elements_text(COALESCE(pd.data_types, '[]'::jsonb)) AS t(data_type)
+                   LEFT JOIN (VALUES ('SSN', 0), ('credit-card', 1), ('api-key', 2), ('password', 3), ('email', 4),
+                                     ('phone-number', 5), ('bank-account', 6), ('address', 7)) AS m(data_type, bit)
+                     USING (data_type)), 0) AS flags
+  FROM endpoints e
+  LEFT JOIN policies p ON p.endpoint_id = e.endpoint_id
+  LEFT JOIN private_data pd ON pd.endpoint_id = e.endpoint_id
+), totals AS (
+  SELECT org_id, SUM(storage_bytes)::bigint AS storage_bytes, SUM(issue_count)::int AS issue_count
+  FROM endpoint_flags
+  GROUP BY org_id
+), bit_counts AS (
+  SELECT f.org_id, b.bit, SUM((f.flags >> b.bit) & 1)::int AS endpoints
+  FROM endpoint_flags f
+  CROSS JOIN generate_series(0, 30) AS b(bit)
+  GROUP BY f.org_id, b.bit
+), data_types AS (
+  SELECT org_id, array_agg(endpoints ORDER BY bit) AS data_type_deltas
+  FROM bit_counts
+  GROUP BY org_id
+)
+INSERT INTO org_rollups (org_id, resolution, bucket, storage_bytes_delta, issue_count_delta, data_type_deltas)
+SELECT t.org_id, r.resolution, date_trunc(r.resolution, now(), 'UTC'), t.storage_bytes, t.issue_count, d.data_type_deltas
+FROM totals t
+JOIN data_types d ON d.org_id = t.org_id
+CROSS JOIN (VALUES ('hour'), ('day'), ('month')) AS r(resolution)
+ON CONFLICT (org_id, resolution, bucket) DO NOTHING;